@@ -2,6 +2,7 @@
 Admin configuration for chat app.
 """
 from django.contrib import admin
+from django.db.models import Count
 from .models import Conversation
 
 
@@ -15,8 +16,15 @@ class ConversationAdmin(admin.ModelAdmin):
     readonly_fields = ['id', 'created_at', 'updated_at']
     filter_horizontal = ['participants']
     
+    def get_queryset(self, request):
+        """Prefetch participants and annotate their count to avoid per-row queries."""
+        return super().get_queryset(request).prefetch_related(
+            'participants'
+        ).annotate(_participant_count=Count('participants'))
+    
     def participant_count(self, obj):
         """Return the number of participants."""
-        return obj.participants.count()
+        return obj._participant_count
     
-    participant_count.short_description = 'Participants' 
\ No newline at end of file
+    participant_count.short_description = 'Participants'
+    participant_count.admin_order_field = '_participant_count'
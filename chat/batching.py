@@ -0,0 +1,56 @@
+"""
+Coalescing of channel-layer group sends.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger('chat')
+
+
+class GroupSendBatcher:
+    """
+    Collects chat messages per group and publishes them as a single
+    ``chat_batch`` event once the flush window closes, so a burst of
+    messages costs one channel-layer publish instead of one per message.
+    """
+    
+    def __init__(self, window: float = 0.01):
+        self.window = window
+        self._pending = {}
+        # The event loop only keeps weak references to tasks, so hold the
+        # flush tasks until they finish or they may be collected mid-sleep
+        self._tasks = set()
+    
+    async def add(self, channel_layer, group_name: str, message: dict):
+        """Queue a message for the group, scheduling a flush if none is pending."""
+        pending = self._pending.get(group_name)
+        if pending is not None:
+            pending.append(message)
+            return
+        
+        self._pending[group_name] = [message]
+        task = asyncio.create_task(self._flush_later(channel_layer, group_name))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _flush_later(self, channel_layer, group_name: str):
+        """Publish the group's pending messages after the flush window."""
+        await asyncio.sleep(self.window)
+        messages = self._pending.pop(group_name, [])
+        if not messages:
+            return
+        
+        try:
+            await channel_layer.group_send(
+                group_name,
+                {
+                    'type': 'chat_batch',
+                    'messages': messages
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error publishing message batch to {group_name}: {str(e)}")
+
+
+# Shared per-process batcher
+group_send_batcher = GroupSendBatcher()
@@ -1,16 +1,20 @@
 """
 WebSocket consumers for real-time chat.
 """
-import json
-import uuid
+import asyncio
+import time
+import msgpack
+import orjson
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
 from django.utils import timezone
 from datetime import datetime
 import logging
 
+from .batching import group_send_batcher
 from .models import Conversation
-from .redis_manager import redis_manager
+from .redis_manager import async_redis_manager
+from .utils import generate_message_id
 from users.models import User
 
 logger = logging.getLogger('chat')
@@ -19,12 +23,31 @@ logger = logging.getLogger('chat')
 class ChatConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for real-time chat messaging."""
     
+    # Inbound messages are persisted to Redis in batches: a batch is flushed
+    # once it holds BATCH_MAX messages or BATCH_TIMEOUT seconds have passed
+    # since its first message, whichever comes first.
+    BATCH_MAX = 32
+    BATCH_TIMEOUT = 0.005
+    
+    # Repeated typing indicators with an unchanged state are forwarded at
+    # most once per TYPING_DEBOUNCE seconds.
+    TYPING_DEBOUNCE = 1.0
+    
+    # Conversations that received messages get their updated_at bumped in
+    # one bulk UPDATE every TOUCH_FLUSH_INTERVAL seconds, per process.
+    TOUCH_FLUSH_INTERVAL = 30
+    _touch_flusher = None
+    
     async def connect(self):
         """Handle WebSocket connection."""
         self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
         self.conversation_group_name = f'chat_{self.conversation_id}'
         self.user = self.scope['user']
         
+        # Clients opt into binary MessagePack frames with ?encoding=msgpack
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        self.use_msgpack = query.get('encoding') == ['msgpack']
+        
         # Check if user is authenticated
         if not self.user.is_authenticated:
             logger.warning(f"Unauthenticated connection attempt to conversation {self.conversation_id}")
@@ -48,17 +71,37 @@ class ChatConsumer(AsyncWebsocketConsumer):
         
         await self.accept()
         
+        # Start background persistence of inbound messages
+        self._message_queue = asyncio.Queue()
+        self._flusher = asyncio.create_task(self.flush_messages())
+        
+        self.ensure_touch_flusher()
+        
+        self._last_typing_sent = 0.0
+        self._last_typing_state = None
+        
+        # Sender details are constant for the connection; resolve them once
+        self._sender_id = self.user.id
+        self._sender_name = self.user.get_full_name()
+        self._sender_email = self.user.email
+        self._group_send = self.channel_layer.group_send
+        
         logger.info(f"User {self.user.id} connected to conversation {self.conversation_id}")
         
         # Send connection confirmation
-        await self.send(text_data=json.dumps({
+        await self.send_payload({
             'type': 'connection_established',
             'message': 'Connected to chat',
-            'conversation_id': str(self.conversation_id)
-        }))
+            'conversation_id': self.conversation_id
+        })
     
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection."""
+        # Persist anything still buffered before tearing down
+        if getattr(self, '_flusher', None) is not None:
+            await self._message_queue.put(None)
+            await self._flusher
+        
         # Leave conversation group
         await self.channel_layer.group_discard(
             self.conversation_group_name,
@@ -67,10 +110,30 @@ class ChatConsumer(AsyncWebsocketConsumer):
         
         logger.info(f"User {self.user.id} disconnected from conversation {self.conversation_id}")
     
-    async def receive(self, text_data):
-        """Handle incoming WebSocket messages."""
+    async def send_payload(self, payload):
+        """Send a payload in the wire format negotiated at connect."""
+        if self.use_msgpack:
+            await self.send(bytes_data=msgpack.packb(payload, use_bin_type=True))
+        else:
+            await self.send(text_data=orjson.dumps(payload).decode())
+    
+    async def receive(self, text_data=None, bytes_data=None):
+        """Handle incoming WebSocket messages (JSON text or MessagePack binary)."""
+        try:
+            if bytes_data is not None:
+                data = msgpack.unpackb(bytes_data, raw=False)
+            else:
+                data = orjson.loads(text_data)
+        except ValueError:
+            # Raised by both orjson and msgpack for malformed frames
+            logger.error(f"Invalid message frame received from user {self.user.id}")
+            await self.send_payload({
+                'type': 'error',
+                'message': 'Invalid message format'
+            })
+            return
+        
         try:
-            data = json.loads(text_data)
             message_type = data.get('type', 'message')
             
             if message_type == 'message':
@@ -82,123 +145,202 @@ class ChatConsumer(AsyncWebsocketConsumer):
             else:
                 logger.warning(f"Unknown message type: {message_type}")
         
-        except json.JSONDecodeError:
-            logger.error(f"Invalid JSON received from user {self.user.id}")
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': 'Invalid message format'
-            }))
         except Exception as e:
             logger.error(f"Error handling message: {str(e)}")
-            await self.send(text_data=json.dumps({
+            await self.send_payload({
                 'type': 'error',
                 'message': 'An error occurred processing your message'
-            }))
+            })
     
     async def handle_chat_message(self, data):
         """Handle chat message."""
         content = data.get('content', '').strip()
         
         if not content:
-            await self.send(text_data=json.dumps({
+            await self.send_payload({
                 'type': 'error',
                 'message': 'Message content cannot be empty'
-            }))
+            })
             return
         
         # Create message data
-        message_id = str(uuid.uuid4())
-        timestamp = datetime.now().timestamp()
+        timestamp = time.time()
+        message_id = generate_message_id(timestamp)
         
         message_data = {
             'id': message_id,
-            'conversation_id': str(self.conversation_id),
-            'sender_id': self.user.id,
-            'sender_name': self.user.get_full_name(),
-            'sender_email': self.user.email,
+            'conversation_id': self.conversation_id,
+            'sender_id': self._sender_id,
+            'sender_name': self._sender_name,
+            'sender_email': self._sender_email,
             'content': content,
             'timestamp': timestamp,
-            'created_at': datetime.now().isoformat()
+            'created_at': datetime.fromtimestamp(timestamp).isoformat()
         }
         
-        # Save message to Redis
-        await database_sync_to_async(redis_manager.save_message)(
-            str(self.conversation_id),
-            message_data
-        )
+        # Queue message for batched persistence to Redis
+        self._message_queue.put_nowait(message_data)
         
-        # Update conversation timestamp
-        await self.update_conversation_timestamp()
+        # Defer the conversation's updated_at bump to the periodic flush
+        await async_redis_manager.mark_touched(self.conversation_id)
         
-        # Broadcast message to conversation group
-        await self.channel_layer.group_send(
+        # Broadcast message to conversation group (coalesced per flush window)
+        await group_send_batcher.add(
+            self.channel_layer,
             self.conversation_group_name,
-            {
-                'type': 'chat_message',
-                'message': message_data
-            }
+            message_data
         )
         
-        logger.info(f"Message sent in conversation {self.conversation_id} by user {self.user.id}")
+        logger.info(f"Message sent in conversation {self.conversation_id} by user {self._sender_id}")
     
     async def handle_typing(self, data):
         """Handle typing indicator."""
         is_typing = data.get('is_typing', False)
         
+        # Drop duplicates of the last broadcast state inside the debounce window
+        now = time.monotonic()
+        if (
+            is_typing == self._last_typing_state
+            and now - self._last_typing_sent < self.TYPING_DEBOUNCE
+        ):
+            return
+        
         # Broadcast typing status to others in the conversation
-        await self.channel_layer.group_send(
+        await self._group_send(
             self.conversation_group_name,
             {
                 'type': 'typing_indicator',
-                'user_id': self.user.id,
-                'user_name': self.user.get_full_name(),
+                'user_id': self._sender_id,
+                'user_name': self._sender_name,
                 'is_typing': is_typing
             }
         )
+        
+        self._last_typing_sent = now
+        self._last_typing_state = is_typing
     
     async def handle_read_receipt(self, data):
         """Handle read receipt."""
         # Reset unread count for this user
-        await database_sync_to_async(redis_manager.reset_unread_count)(
-            str(self.conversation_id),
-            self.user.id
+        await async_redis_manager.reset_unread_count(
+            self.conversation_id,
+            self._sender_id
         )
     
     async def chat_message(self, event):
         """Send chat message to WebSocket."""
         message = event['message']
         
-        await self.send(text_data=json.dumps({
+        await self.send_payload({
             'type': 'message',
             'message': message
-        }))
+        })
+    
+    async def chat_batch(self, event):
+        """Send a batch of chat messages to WebSocket in a single frame."""
+        messages = event['messages']
+        
+        if len(messages) == 1:
+            await self.send_payload({
+                'type': 'message',
+                'message': messages[0]
+            })
+        else:
+            await self.send_payload({
+                'type': 'message_batch',
+                'messages': messages
+            })
     
     async def typing_indicator(self, event):
         """Send typing indicator to WebSocket."""
         # Don't send typing indicator to the user who is typing
-        if event['user_id'] != self.user.id:
-            await self.send(text_data=json.dumps({
+        if event['user_id'] != self._sender_id:
+            await self.send_payload({
                 'type': 'typing',
                 'user_id': event['user_id'],
                 'user_name': event['user_name'],
                 'is_typing': event['is_typing']
-            }))
+            })
     
-    @database_sync_to_async
-    def verify_participant(self):
-        """Verify that the user is a participant in the conversation."""
-        try:
-            conversation = Conversation.objects.get(id=self.conversation_id)
-            return conversation.participants.filter(id=self.user.id).exists()
-        except Conversation.DoesNotExist:
-            return False
-    
-    @database_sync_to_async
-    def update_conversation_timestamp(self):
-        """Update the conversation's updated_at timestamp."""
-        try:
-            conversation = Conversation.objects.get(id=self.conversation_id)
-            conversation.updated_at = timezone.now()
-            conversation.save(update_fields=['updated_at'])
-        except Conversation.DoesNotExist:
-            logger.error(f"Conversation {self.conversation_id} not found") 
\ No newline at end of file
+    async def flush_messages(self):
+        """Persist queued messages to Redis in pipelined batches."""
+        loop = asyncio.get_running_loop()
+        done = False
+        
+        while not done:
+            message = await self._message_queue.get()
+            if message is None:
+                return
+            
+            # Collect more messages until the batch is full or the window closes
+            batch = [message]
+            deadline = loop.time() + self.BATCH_TIMEOUT
+            while len(batch) < self.BATCH_MAX:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(self._message_queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if message is None:
+                    done = True
+                    break
+                batch.append(message)
+            
+            await async_redis_manager.save_messages(
+                self.conversation_id,
+                batch
+            )
+    
+    async def verify_participant(self):
+        """
+        Verify that the user is a participant in the conversation.
+        Answers from the Redis participant set when cached; otherwise loads
+        the participants from the database and caches them.
+        """
+        is_participant = await async_redis_manager.is_participant(
+            self.conversation_id,
+            self.user.id
+        )
+        if is_participant is not None:
+            return is_participant
+        
+        participant_ids = await self.get_participant_ids()
+        await async_redis_manager.set_participants(
+            self.conversation_id,
+            participant_ids
+        )
+        return self.user.id in participant_ids
+    
+    async def get_participant_ids(self):
+        """Load the ids of all participants in the conversation."""
+        return [
+            user_id async for user_id in Conversation.participants.through.objects.filter(
+                conversation_id=self.conversation_id
+            ).values_list('user_id', flat=True)
+        ]
+    
+    @classmethod
+    def ensure_touch_flusher(cls):
+        """Start the per-process touched-conversation flusher if not running."""
+        task = cls._touch_flusher
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            cls._touch_flusher = asyncio.create_task(cls.flush_touched_conversations())
+    
+    @classmethod
+    async def flush_touched_conversations(cls):
+        """Periodically bump updated_at for conversations with new messages."""
+        while True:
+            await asyncio.sleep(cls.TOUCH_FLUSH_INTERVAL)
+            try:
+                while True:
+                    conversation_ids = await async_redis_manager.pop_touched_conversations()
+                    if not conversation_ids:
+                        break
+                    await Conversation.objects.filter(
+                        id__in=conversation_ids
+                    ).aupdate(updated_at=timezone.now())
+                    logger.debug(f"Bumped updated_at for {len(conversation_ids)} conversation(s)")
+            except Exception as e:
+                logger.error(f"Error flushing touched conversations: {str(e)}")
@@ -1,13 +1,24 @@
 """
 Custom middleware to disable CSRF for API endpoints.
 """
-from django.utils.deprecation import MiddlewareMixin
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 
-class DisableCSRFForAPI(MiddlewareMixin):
+API_PREFIX = '/api/'
+
+
+class DisableCSRFForAPI:
     """Disable CSRF protection for API endpoints."""
     
-    def process_request(self, request):
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
         # Disable CSRF for all API endpoints
-        if request.path.startswith('/api/'):
-            setattr(request, '_dont_enforce_csrf_checks', True)
-        return None
+        if request.path.startswith(API_PREFIX):
+            request._dont_enforce_csrf_checks = True
+        return self.get_response(request)
@@ -4,6 +4,7 @@ Custom exception handlers for the chat application.
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotAuthenticated
 import logging
 
 logger = logging.getLogger('api')
@@ -34,6 +35,16 @@ def custom_exception_handler(exc, context):
             'detail': str(exc)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    # Session auth has no WWW-Authenticate challenge, so DRF reports missing
+    # credentials as 403; keep the API's 401 'Authentication required'
+    if isinstance(exc, NotAuthenticated):
+        response.status_code = status.HTTP_401_UNAUTHORIZED
+        response.data = {
+            'status': 'error',
+            'message': 'Authentication required'
+        }
+        return response
+    
     # Format the response consistently
     error_data = {
         'status': 'error',
@@ -3,45 +3,69 @@ Custom middleware for the chat application.
 """
 import logging
 import time
-from django.utils.deprecation import MiddlewareMixin
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 
 logger = logging.getLogger('api')
 
+# Requests for these prefixes are served without API logging
+UNLOGGED_PREFIXES = ('/static/', '/media/')
 
-class APILoggingMiddleware(MiddlewareMixin):
+
+class APILoggingMiddleware:
     """Middleware to log all API requests."""
     
-    def process_request(self, request):
-        """Log incoming requests."""
-        request.start_time = time.time()
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         
-        # Log API request
-        log_data = {
-            'method': request.method,
-            'path': request.path,
-            'user': request.user.id if request.user.is_authenticated else 'anonymous',
-            'ip': self.get_client_ip(request),
-            'user_agent': request.META.get('HTTP_USER_AGENT', 'unknown')
-        }
+        if request.path.startswith(UNLOGGED_PREFIXES) or not logger.isEnabledFor(logging.INFO):
+            return self.get_response(request)
         
+        start_time = time.time()
+        self.log_request(request)
+        response = self.get_response(request)
+        self.log_response(request, response, start_time)
+        return response
+    
+    async def __acall__(self, request):
+        if request.path.startswith(UNLOGGED_PREFIXES) or not logger.isEnabledFor(logging.INFO):
+            return await self.get_response(request)
+        
+        start_time = time.time()
+        # Resolving request.user may hit the session store, so run it off-loop
+        await sync_to_async(self.log_request)(request)
+        response = await self.get_response(request)
+        self.log_response(request, response, start_time)
+        return response
+    
+    def log_request(self, request):
+        """Log incoming requests."""
         logger.info(
-            f"API Request: {log_data['method']} {log_data['path']} "
-            f"- User: {log_data['user']} - IP: {log_data['ip']}"
+            "API Request: %s %s - User: %s - IP: %s",
+            request.method,
+            request.path,
+            request.user.id if request.user.is_authenticated else 'anonymous',
+            self.get_client_ip(request)
         )
-        
-        return None
     
-    def process_response(self, request, response):
+    @staticmethod
+    def log_response(request, response, start_time):
         """Log response details."""
-        if hasattr(request, 'start_time'):
-            duration = time.time() - request.start_time
-            
-            logger.info(
-                f"API Response: {request.method} {request.path} "
-                f"- Status: {response.status_code} - Duration: {duration:.3f}s"
-            )
-        
-        return response
+        logger.info(
+            "API Response: %s %s - Status: %s - Duration: %.3fs",
+            request.method,
+            request.path,
+            response.status_code,
+            time.time() - start_time
+        )
     
     @staticmethod
     def get_client_ip(request):
@@ -51,4 +75,4 @@ class APILoggingMiddleware(MiddlewareMixin):
             ip = x_forwarded_for.split(',')[0]
         else:
             ip = request.META.get('REMOTE_ADDR')
-        return ip 
\ No newline at end of file
+        return ip
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-15 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='conversation',
+            name='is_group',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -7,6 +7,17 @@ from django.utils import timezone
 import uuid
 
 
+def build_display_name(name, is_group, short_names):
+    """Display name for a conversation given its participants' short names."""
+    if name:
+        return name
+    if is_group:
+        return f"Group with {', '.join(short_names[:3])}"
+    elif len(short_names) == 2:
+        return f"Chat with {short_names[0]} and {short_names[1]}"
+    return "Conversation"
+
+
 class Conversation(models.Model):
     """
     Model to store conversation metadata.
@@ -20,7 +31,7 @@ class Conversation(models.Model):
     )
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
-    is_group = models.BooleanField(default=False)
+    is_group = models.BooleanField(default=False, db_index=True)
     
     class Meta:
         db_table = 'conversations'
@@ -34,14 +45,19 @@ class Conversation(models.Model):
             return f"Conversation: {', '.join([p.get_short_name() for p in participants_list])}"
         return f"Conversation {self.id}"
     
-    def get_or_create_name(self):
-        """Generate a name for the conversation if not set."""
+    def get_or_create_name(self, participants=None):
+        """
+        Generate a name for the conversation if not set.
+        Callers that already hold the participants can pass them in to
+        avoid another query.
+        """
         if self.name:
             return self.name
         
-        participants = list(self.participants.all())
-        if self.is_group:
-            return f"Group with {', '.join([p.get_short_name() for p in participants[:3]])}"
-        elif len(participants) == 2:
-            return f"Chat with {participants[0].get_short_name()} and {participants[1].get_short_name()}"
-        return "Conversation" 
\ No newline at end of file
+        if participants is None:
+            participants = list(self.participants.all())
+        return build_display_name(
+            self.name,
+            self.is_group,
+            [p.get_short_name() for p in participants]
+        ) 
\ No newline at end of file
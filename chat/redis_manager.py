@@ -3,53 +3,95 @@ Redis manager for message storage.
 Messages are stored in Redis for fast access and retrieval.
 """
 import redis
-import json
+from redis import asyncio as aioredis
+import orjson
 from django.conf import settings
-from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import logging
 
 logger = logging.getLogger('chat')
 
+# Shared connection pools, sized for many concurrent WebSocket consumers.
+# Blocking pools make callers wait for a free connection under bursts
+# instead of failing once max_connections is reached. Responses are left
+# as bytes: orjson parses bytes directly, so decoding to str first would
+# only add a copy.
+_POOL_OPTIONS = {
+    'host': settings.REDIS_HOST,
+    'port': settings.REDIS_PORT,
+    'db': settings.REDIS_DB,
+    'max_connections': settings.REDIS_MAX_CONNECTIONS,
+    'socket_keepalive': True,
+    'health_check_interval': 30,
+}
+connection_pool = redis.BlockingConnectionPool(**_POOL_OPTIONS)
+async_connection_pool = aioredis.BlockingConnectionPool(**_POOL_OPTIONS)
 
-class RedisMessageManager:
-    """Manager for storing and retrieving messages from Redis."""
-    
-    def __init__(self):
-        self.redis_client = redis.Redis(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            db=settings.REDIS_DB,
-            decode_responses=True
-        )
+
+class BaseRedisMessageManager:
+    """Key layout shared by the sync and asyncio Redis managers."""
     
     def _get_conversation_key(self, conversation_id: str) -> str:
-        """Generate Redis key for a conversation."""
-        return f"conversation:{conversation_id}:messages"
+        """Generate Redis key for a conversation's message stream."""
+        return f"conversation:{conversation_id}:stream"
     
-    def _get_unread_key(self, conversation_id: str, user_id: int) -> str:
-        """Generate Redis key for unread message count."""
-        return f"conversation:{conversation_id}:user:{user_id}:unread"
+    def _get_unread_key(self, user_id: int) -> str:
+        """
+        Generate Redis key for a user's unread counts: a hash with one field
+        per conversation id.
+        """
+        return f"user:{user_id}:unread"
+    
+    def _get_participants_key(self, conversation_id: str) -> str:
+        """Generate Redis key for the cached participant set."""
+        return f"conversation:{conversation_id}:participants"
+    
+    def _get_touched_key(self) -> str:
+        """Generate Redis key for conversations awaiting an updated_at bump."""
+        return "conversations:touched"
+    
+    @staticmethod
+    def _decode_entries(entries) -> List[Dict]:
+        """Decode stream entries into message dicts."""
+        return [orjson.loads(fields[b'data']) for _, fields in entries]
+
+
+class RedisMessageManager(BaseRedisMessageManager):
+    """Manager for storing and retrieving messages from Redis."""
+    
+    def __init__(self):
+        self.redis_client = redis.Redis(connection_pool=connection_pool)
     
     def save_message(self, conversation_id: str, message_data: Dict) -> bool:
         """
         Save a message to Redis.
-        Messages are stored in a sorted set with timestamp as score.
+        Messages are appended to a stream capped at MESSAGE_STREAM_MAXLEN.
+        """
+        return self.save_messages(conversation_id, [message_data])
+    
+    def save_messages(self, conversation_id: str, messages: List[Dict]) -> bool:
+        """
+        Save a batch of messages to Redis in a single round-trip.
+        All XADDs and one EXPIRE are sent through one pipeline.
         """
         try:
             key = self._get_conversation_key(conversation_id)
-            score = message_data.get('timestamp', datetime.now().timestamp())
+            pipe = self.redis_client.pipeline(transaction=False)
             
-            # Store message as JSON
-            message_json = json.dumps(message_data)
-            
-            # Add to sorted set (allows retrieval by time)
-            self.redis_client.zadd(key, {message_json: score})
+            for message_data in messages:
+                # Append message as JSON; MAXLEN trimming bounds memory
+                pipe.xadd(
+                    key,
+                    {'data': orjson.dumps(message_data)},
+                    maxlen=settings.MESSAGE_STREAM_MAXLEN,
+                    approximate=True
+                )
             
             # Set expiry for the conversation (24 hours by default)
-            self.redis_client.expire(key, settings.MESSAGE_EXPIRY)
+            pipe.expire(key, settings.MESSAGE_EXPIRY)
+            pipe.execute()
             
-            logger.debug(f"Message saved to Redis: conversation={conversation_id}")
+            logger.debug(f"{len(messages)} message(s) saved to Redis: conversation={conversation_id}")
             return True
         except Exception as e:
             logger.error(f"Error saving message to Redis: {str(e)}")
@@ -68,15 +110,11 @@ class RedisMessageManager:
         try:
             key = self._get_conversation_key(conversation_id)
             
-            # Get messages from sorted set (oldest first)
-            # offset to (offset + limit - 1)
-            messages_json = self.redis_client.zrange(
-                key,
-                offset,
-                offset + limit - 1
-            )
+            # Streams have no index-based paging; read the first
+            # (offset + limit) entries (oldest first) and drop the offset
+            entries = self.redis_client.xrange(key, count=offset + limit)
             
-            messages = [json.loads(msg) for msg in messages_json]
+            messages = self._decode_entries(entries[offset:])
             logger.debug(f"Retrieved {len(messages)} messages from Redis: conversation={conversation_id}")
             
             return messages
@@ -96,14 +134,10 @@ class RedisMessageManager:
         try:
             key = self._get_conversation_key(conversation_id)
             
-            # Get latest messages (using negative indices for newest)
-            messages_json = self.redis_client.zrange(
-                key,
-                -limit,
-                -1
-            )
+            # Get latest entries (newest first) and restore chronological order
+            entries = self.redis_client.xrevrange(key, count=limit)
             
-            messages = [json.loads(msg) for msg in messages_json]
+            messages = self._decode_entries(reversed(entries))
             logger.debug(f"Retrieved {len(messages)} latest messages from Redis: conversation={conversation_id}")
             
             return messages
@@ -111,11 +145,39 @@ class RedisMessageManager:
             logger.error(f"Error retrieving latest messages from Redis: {str(e)}")
             return []
     
+    def fetch_page(
+        self,
+        conversation_id: str,
+        user_id: int,
+        limit: int = 50
+    ) -> Tuple[List[Dict], int]:
+        """
+        Get the latest N messages and the total message count for a
+        conversation and reset the user's unread count, all in a single
+        round-trip. Returns (messages, total).
+        """
+        try:
+            key = self._get_conversation_key(conversation_id)
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.xrevrange(key, count=limit)
+            pipe.xlen(key)
+            pipe.hdel(self._get_unread_key(user_id), conversation_id)
+            entries, total, _ = pipe.execute()
+            
+            messages = self._decode_entries(reversed(entries))
+            logger.debug(f"Retrieved page with {len(messages)} messages from Redis: conversation={conversation_id}")
+            
+            return messages, total
+        except Exception as e:
+            logger.error(f"Error retrieving message page from Redis: {str(e)}")
+            return [], 0
+    
     def get_message_count(self, conversation_id: str) -> int:
         """Get total message count for a conversation."""
         try:
             key = self._get_conversation_key(conversation_id)
-            count = self.redis_client.zcard(key)
+            count = self.redis_client.xlen(key)
             return count
         except Exception as e:
             logger.error(f"Error getting message count from Redis: {str(e)}")
@@ -135,9 +197,11 @@ class RedisMessageManager:
     def increment_unread_count(self, conversation_id: str, user_id: int) -> int:
         """Increment unread message count for a user in a conversation."""
         try:
-            key = self._get_unread_key(conversation_id, user_id)
-            count = self.redis_client.incr(key)
-            self.redis_client.expire(key, settings.MESSAGE_EXPIRY)
+            key = self._get_unread_key(user_id)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hincrby(key, conversation_id, 1)
+            pipe.expire(key, settings.MESSAGE_EXPIRY)
+            count, _ = pipe.execute()
             return count
         except Exception as e:
             logger.error(f"Error incrementing unread count: {str(e)}")
@@ -146,8 +210,7 @@ class RedisMessageManager:
     def reset_unread_count(self, conversation_id: str, user_id: int) -> bool:
         """Reset unread message count for a user in a conversation."""
         try:
-            key = self._get_unread_key(conversation_id, user_id)
-            self.redis_client.delete(key)
+            self.redis_client.hdel(self._get_unread_key(user_id), conversation_id)
             return True
         except Exception as e:
             logger.error(f"Error resetting unread count: {str(e)}")
@@ -156,13 +219,240 @@ class RedisMessageManager:
     def get_unread_count(self, conversation_id: str, user_id: int) -> int:
         """Get unread message count for a user in a conversation."""
         try:
-            key = self._get_unread_key(conversation_id, user_id)
-            count = self.redis_client.get(key)
+            count = self.redis_client.hget(self._get_unread_key(user_id), conversation_id)
             return int(count) if count else 0
         except Exception as e:
             logger.error(f"Error getting unread count: {str(e)}")
             return 0
+    
+    def get_counts_bulk(
+        self,
+        conversation_ids: List[str],
+        user_id: int
+    ) -> Dict[str, Tuple[int, int]]:
+        """
+        Get message and unread counts for several conversations in a single
+        round-trip: one XLEN per stream plus a single HMGET over the user's
+        unread hash. Returns {conversation_id: (message_count, unread_count)}.
+        """
+        if not conversation_ids:
+            return {}
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for conversation_id in conversation_ids:
+                pipe.xlen(self._get_conversation_key(conversation_id))
+            pipe.hmget(self._get_unread_key(user_id), conversation_ids)
+            *message_counts, unread_counts = pipe.execute()
+            return {
+                conversation_id: (message_count, int(unread) if unread else 0)
+                for conversation_id, message_count, unread in zip(
+                    conversation_ids, message_counts, unread_counts
+                )
+            }
+        except Exception as e:
+            logger.error(f"Error getting conversation counts: {str(e)}")
+            return {conversation_id: (0, 0) for conversation_id in conversation_ids}
+    
+    def get_conv_meta(self, conversation_id: str, user_id: int) -> Tuple[int, int]:
+        """Get (message_count, unread_count) for a conversation in one round-trip."""
+        return self.get_counts_bulk([conversation_id], user_id)[conversation_id]
+    
+    def set_participants(self, conversation_id: str, user_ids: List[int]) -> bool:
+        """Replace the cached participant set for a conversation."""
+        try:
+            key = self._get_participants_key(conversation_id)
+            pipe = self.redis_client.pipeline()
+            pipe.delete(key)
+            if user_ids:
+                pipe.sadd(key, *user_ids)
+                pipe.expire(key, settings.PARTICIPANTS_CACHE_EXPIRY)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error caching participants: {str(e)}")
+            return False
+    
+    def delete_participants(self, conversation_id: str) -> bool:
+        """Drop the cached participant set for a conversation."""
+        try:
+            self.redis_client.delete(self._get_participants_key(conversation_id))
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting cached participants: {str(e)}")
+            return False
+    
+    def is_participant(self, conversation_id: str, user_id: int) -> Optional[bool]:
+        """
+        Check cached membership of a user in a conversation.
+        Returns None when the participant set is not cached.
+        """
+        try:
+            key = self._get_participants_key(conversation_id)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.exists(key)
+            pipe.sismember(key, user_id)
+            cached, is_member = pipe.execute()
+            return bool(is_member) if cached else None
+        except Exception as e:
+            logger.error(f"Error checking cached participants: {str(e)}")
+            return None
+
+
+class AsyncRedisMessageManager(BaseRedisMessageManager):
+    """
+    asyncio counterpart of RedisMessageManager.
+    Used by WebSocket consumers so Redis calls are awaited directly on the
+    event loop instead of hopping to a worker thread.
+    """
+    
+    def __init__(self):
+        self.redis_client = aioredis.Redis(connection_pool=async_connection_pool)
+    
+    async def save_message(self, conversation_id: str, message_data: Dict) -> bool:
+        """Save a message to Redis."""
+        return await self.save_messages(conversation_id, [message_data])
+    
+    async def save_messages(self, conversation_id: str, messages: List[Dict]) -> bool:
+        """Save a batch of messages to Redis in a single round-trip."""
+        try:
+            key = self._get_conversation_key(conversation_id)
+            pipe = self.redis_client.pipeline(transaction=False)
+            
+            for message_data in messages:
+                pipe.xadd(
+                    key,
+                    {'data': orjson.dumps(message_data)},
+                    maxlen=settings.MESSAGE_STREAM_MAXLEN,
+                    approximate=True
+                )
+            
+            pipe.expire(key, settings.MESSAGE_EXPIRY)
+            await pipe.execute()
+            
+            logger.debug(f"{len(messages)} message(s) saved to Redis: conversation={conversation_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving message to Redis: {str(e)}")
+            return False
+    
+    async def get_messages(
+        self,
+        conversation_id: str,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[Dict]:
+        """Retrieve messages for a conversation (oldest first)."""
+        try:
+            key = self._get_conversation_key(conversation_id)
+            entries = await self.redis_client.xrange(key, count=offset + limit)
+            return self._decode_entries(entries[offset:])
+        except Exception as e:
+            logger.error(f"Error retrieving messages from Redis: {str(e)}")
+            return []
+    
+    async def get_latest_messages(
+        self,
+        conversation_id: str,
+        limit: int = 50
+    ) -> List[Dict]:
+        """Get the latest N messages from a conversation (oldest first)."""
+        try:
+            key = self._get_conversation_key(conversation_id)
+            entries = await self.redis_client.xrevrange(key, count=limit)
+            return self._decode_entries(reversed(entries))
+        except Exception as e:
+            logger.error(f"Error retrieving latest messages from Redis: {str(e)}")
+            return []
+    
+    async def get_message_count(self, conversation_id: str) -> int:
+        """Get total message count for a conversation."""
+        try:
+            return await self.redis_client.xlen(self._get_conversation_key(conversation_id))
+        except Exception as e:
+            logger.error(f"Error getting message count from Redis: {str(e)}")
+            return 0
+    
+    async def increment_unread_count(self, conversation_id: str, user_id: int) -> int:
+        """Increment unread message count for a user in a conversation."""
+        try:
+            key = self._get_unread_key(user_id)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hincrby(key, conversation_id, 1)
+            pipe.expire(key, settings.MESSAGE_EXPIRY)
+            count, _ = await pipe.execute()
+            return count
+        except Exception as e:
+            logger.error(f"Error incrementing unread count: {str(e)}")
+            return 0
+    
+    async def reset_unread_count(self, conversation_id: str, user_id: int) -> bool:
+        """Reset unread message count for a user in a conversation."""
+        try:
+            await self.redis_client.hdel(self._get_unread_key(user_id), conversation_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error resetting unread count: {str(e)}")
+            return False
+    
+    async def get_unread_count(self, conversation_id: str, user_id: int) -> int:
+        """Get unread message count for a user in a conversation."""
+        try:
+            count = await self.redis_client.hget(self._get_unread_key(user_id), conversation_id)
+            return int(count) if count else 0
+        except Exception as e:
+            logger.error(f"Error getting unread count: {str(e)}")
+            return 0
+    
+    async def set_participants(self, conversation_id: str, user_ids: List[int]) -> bool:
+        """Replace the cached participant set for a conversation."""
+        try:
+            key = self._get_participants_key(conversation_id)
+            pipe = self.redis_client.pipeline()
+            pipe.delete(key)
+            if user_ids:
+                pipe.sadd(key, *user_ids)
+                pipe.expire(key, settings.PARTICIPANTS_CACHE_EXPIRY)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error caching participants: {str(e)}")
+            return False
+    
+    async def is_participant(self, conversation_id: str, user_id: int) -> Optional[bool]:
+        """
+        Check cached membership of a user in a conversation.
+        Returns None when the participant set is not cached.
+        """
+        try:
+            key = self._get_participants_key(conversation_id)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.exists(key)
+            pipe.sismember(key, user_id)
+            cached, is_member = await pipe.execute()
+            return bool(is_member) if cached else None
+        except Exception as e:
+            logger.error(f"Error checking cached participants: {str(e)}")
+            return None
+    
+    async def mark_touched(self, conversation_id: str) -> bool:
+        """Record that a conversation received a message since the last flush."""
+        try:
+            await self.redis_client.sadd(self._get_touched_key(), conversation_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error marking conversation as touched: {str(e)}")
+            return False
+    
+    async def pop_touched_conversations(self, count: int = 1000) -> List[str]:
+        """Atomically remove and return up to ``count`` touched conversation ids."""
+        try:
+            conversation_ids = await self.redis_client.spop(self._get_touched_key(), count) or []
+            return [conversation_id.decode() for conversation_id in conversation_ids]
+        except Exception as e:
+            logger.error(f"Error popping touched conversations: {str(e)}")
+            return []
 
 
-# Singleton instance
-redis_manager = RedisMessageManager() 
\ No newline at end of file
+# Singleton instances
+redis_manager = RedisMessageManager()
+async_redis_manager = AsyncRedisMessageManager() 
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""
+Custom renderers for API responses.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_fallback_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON renderer backed by orjson.
+    Datetimes and anything orjson can't encode natively (lazy strings,
+    Decimals, querysets, ...) go through DRF's encoder so output matches
+    the stock JSONRenderer.
+    """
+    
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render `data` into JSON bytes."""
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_fallback_encoder.default, option=self.options)
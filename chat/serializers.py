@@ -3,6 +3,7 @@ Serializers for chat models.
 """
 from rest_framework import serializers
 from .models import Conversation
+from users.models import User
 from users.serializers import UserSerializer
 
 
@@ -46,6 +47,16 @@ class ConversationSerializer(serializers.ModelSerializer):
         if len(set(value)) != len(value):
             raise serializers.ValidationError("Duplicate participants are not allowed.")
         
+        # Check all participants exist, reusing users the view already
+        # fetched or else with a single IN query
+        participants = self.context.get('participants')
+        if participants is None:
+            participants = list(User.objects.filter(id__in=value).only('id'))
+        missing = set(value) - {user.id for user in participants}
+        if missing:
+            raise serializers.ValidationError(f"Unknown user ids: {sorted(missing)}")
+        
+        self._participants = participants
         return value
     
     def create(self, validated_data):
@@ -57,7 +68,9 @@ class ConversationSerializer(serializers.ModelSerializer):
             is_group=is_group,
             **validated_data
         )
-        conversation.participants.set(participant_ids)
+        # Users were resolved in validate_participant_ids and the conversation
+        # is new, so add() can insert directly without set()'s diffing query
+        conversation.participants.add(*self._participants)
         
         return conversation
 
@@ -0,0 +1,55 @@
+"""
+Signal handlers for the chat application.
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+
+from .models import Conversation
+from .redis_manager import redis_manager
+
+
+def refresh_participants_cache(conversation_id):
+    """Rebuild the cached participant set of a conversation from the database."""
+    user_ids = list(
+        Conversation.participants.through.objects.filter(
+            conversation_id=conversation_id
+        ).values_list('user_id', flat=True)
+    )
+    redis_manager.set_participants(str(conversation_id), user_ids)
+
+
+def schedule_participants_refresh(conversation_id):
+    """
+    Refresh the cached participant set once the current transaction commits,
+    so a rolled-back change never reaches the cache.
+    """
+    transaction.on_commit(lambda: refresh_participants_cache(conversation_id))
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def sync_participants_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """Mirror participant changes into the Redis participant cache."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            schedule_participants_refresh(instance.pk)
+        return
+    
+    # Reverse side: ``instance`` is a user and ``pk_set`` holds conversation ids
+    if action == 'pre_clear':
+        instance._cleared_conversation_ids = list(
+            instance.conversations.values_list('id', flat=True)
+        )
+    elif action == 'post_clear':
+        for conversation_id in getattr(instance, '_cleared_conversation_ids', []):
+            schedule_participants_refresh(conversation_id)
+    elif action in ('post_add', 'post_remove'):
+        for conversation_id in pk_set:
+            schedule_participants_refresh(conversation_id)
+
+
+@receiver(post_delete, sender=Conversation)
+def drop_participants_cache(sender, instance, **kwargs):
+    """Forget a deleted conversation's participants; deletes send no m2m_changed."""
+    conversation_id = str(instance.pk)
+    transaction.on_commit(lambda: redis_manager.delete_participants(conversation_id))
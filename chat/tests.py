@@ -1,8 +1,11 @@
 """
 Tests for chat app.
 """
+import asyncio
 import pytest
 import json
+import uuid
+from asgiref.sync import sync_to_async
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -13,27 +16,18 @@ from django.urls import re_path
 from users.models import User
 from chat.models import Conversation
 from chat.consumers import ChatConsumer
-from chat.redis_manager import redis_manager
+from chat.batching import group_send_batcher
+from chat.redis_manager import redis_manager, async_connection_pool
 
 
 @pytest.mark.django_db
 class TestConversationCreation:
     """Test conversation creation."""
     
-    def test_create_conversation(self):
+    def test_create_conversation(self, make_user):
         """Test creating a new conversation."""
-        user1 = User.objects.create_user(
-            email='user1@example.com',
-            first_name='User',
-            last_name='One',
-            password='Password123'
-        )
-        user2 = User.objects.create_user(
-            email='user2@example.com',
-            first_name='User',
-            last_name='Two',
-            password='Password123'
-        )
+        user1 = make_user('user1@example.com')
+        user2 = make_user('user2@example.com')
         
         client = APIClient()
         client.force_authenticate(user=user1)
@@ -54,26 +48,11 @@ class TestConversationCreation:
         assert conversation.participants.count() == 2
         assert not conversation.is_group
     
-    def test_create_group_conversation(self):
+    def test_create_group_conversation(self, make_user):
         """Test creating a group conversation."""
-        user1 = User.objects.create_user(
-            email='user1@example.com',
-            first_name='User',
-            last_name='One',
-            password='Password123'
-        )
-        user2 = User.objects.create_user(
-            email='user2@example.com',
-            first_name='User',
-            last_name='Two',
-            password='Password123'
-        )
-        user3 = User.objects.create_user(
-            email='user3@example.com',
-            first_name='User',
-            last_name='Three',
-            password='Password123'
-        )
+        user1 = make_user('user1@example.com')
+        user2 = make_user('user2@example.com')
+        user3 = make_user('user3@example.com')
         
         client = APIClient()
         client.force_authenticate(user=user1)
@@ -108,20 +87,10 @@ class TestConversationCreation:
 class TestConversationList:
     """Test listing conversations."""
     
-    def test_list_conversations(self):
+    def test_list_conversations(self, make_user):
         """Test listing user's conversations."""
-        user1 = User.objects.create_user(
-            email='user1@example.com',
-            first_name='User',
-            last_name='One',
-            password='Password123'
-        )
-        user2 = User.objects.create_user(
-            email='user2@example.com',
-            first_name='User',
-            last_name='Two',
-            password='Password123'
-        )
+        user1 = make_user('user1@example.com')
+        user2 = make_user('user2@example.com')
         
         # Create a conversation
         conversation = Conversation.objects.create()
@@ -142,20 +111,10 @@ class TestConversationList:
 class TestMessages:
     """Test message retrieval."""
     
-    def test_get_messages(self):
+    def test_get_messages(self, make_user):
         """Test retrieving messages from a conversation."""
-        user1 = User.objects.create_user(
-            email='user1@example.com',
-            first_name='User',
-            last_name='One',
-            password='Password123'
-        )
-        user2 = User.objects.create_user(
-            email='user2@example.com',
-            first_name='User',
-            last_name='Two',
-            password='Password123'
-        )
+        user1 = make_user('user1@example.com')
+        user2 = make_user('user2@example.com')
         
         # Create a conversation
         conversation = Conversation.objects.create()
@@ -184,26 +143,11 @@ class TestMessages:
         assert 'data' in response.data
         assert len(response.data['data']['messages']) == 1
     
-    def test_get_messages_unauthorized(self):
+    def test_get_messages_unauthorized(self, make_user):
         """Test retrieving messages from conversation user is not part of."""
-        user1 = User.objects.create_user(
-            email='user1@example.com',
-            first_name='User',
-            last_name='One',
-            password='Password123'
-        )
-        user2 = User.objects.create_user(
-            email='user2@example.com',
-            first_name='User',
-            last_name='Two',
-            password='Password123'
-        )
-        user3 = User.objects.create_user(
-            email='user3@example.com',
-            first_name='User',
-            last_name='Three',
-            password='Password123'
-        )
+        user1 = make_user('user1@example.com')
+        user2 = make_user('user2@example.com')
+        user3 = make_user('user3@example.com')
         
         # Create a conversation between user1 and user2
         conversation = Conversation.objects.create()
@@ -217,6 +161,55 @@ class TestMessages:
         response = client.get(url)
         
         assert response.status_code == status.HTTP_403_FORBIDDEN
+    
+    def test_get_messages_unknown_conversation(self, make_user):
+        """Test retrieving messages from a conversation that doesn't exist."""
+        user1 = make_user('user1@example.com')
+        
+        client = APIClient()
+        client.force_authenticate(user=user1)
+        
+        url = reverse('chat:messages', kwargs={'conversation_id': uuid.uuid4()})
+        response = client.get(url)
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_get_messages_rate_limited(self, make_user):
+        """Test the message endpoint rejects requests over the rate limit."""
+        user1 = make_user('user1@example.com')
+        user2 = make_user('user2@example.com')
+        
+        conversation = Conversation.objects.create()
+        conversation.participants.add(user1, user2)
+        
+        client = APIClient()
+        client.force_authenticate(user=user1)
+        
+        url = reverse('chat:messages', kwargs={'conversation_id': conversation.id})
+        throttle_key = f'throttle_message_{user1.pk}'
+        redis_manager.redis_client.delete(throttle_key)
+        try:
+            for _ in range(10):
+                assert client.get(url).status_code == status.HTTP_200_OK
+            
+            response = client.get(url)
+            assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        finally:
+            redis_manager.redis_client.delete(throttle_key)
+
+
+@pytest.mark.django_db
+class TestHealthCheck:
+    """Test the health check endpoint."""
+    
+    def test_health_check_answers_get_and_head(self):
+        """Test load balancers can probe with either GET or HEAD."""
+        client = APIClient()
+        url = reverse('chat:health')
+        
+        assert client.get(url).status_code == status.HTTP_200_OK
+        assert client.head(url).status_code == status.HTTP_200_OK
+        assert client.post(url).status_code == status.HTTP_405_METHOD_NOT_ALLOWED
 
 
 @pytest.mark.django_db
@@ -266,23 +259,194 @@ class TestRedisManager:
         
         # Clean up
         redis_manager.delete_conversation(conversation_id)
+    
+    def test_unread_counts(self):
+        """Test unread counters for a user across conversations."""
+        user_id = 987654
+        
+        redis_manager.increment_unread_count('test-conv-a', user_id)
+        redis_manager.increment_unread_count('test-conv-a', user_id)
+        redis_manager.increment_unread_count('test-conv-b', user_id)
+        
+        counts = redis_manager.get_counts_bulk(['test-conv-a', 'test-conv-b', 'test-conv-c'], user_id)
+        assert counts == {'test-conv-a': (0, 2), 'test-conv-b': (0, 1), 'test-conv-c': (0, 0)}
+        
+        redis_manager.reset_unread_count('test-conv-a', user_id)
+        assert redis_manager.get_unread_count('test-conv-a', user_id) == 0
+        assert redis_manager.get_unread_count('test-conv-b', user_id) == 1
+        
+        # Clean up
+        redis_manager.reset_unread_count('test-conv-b', user_id)
 
 
 @pytest.mark.django_db
+class TestParticipantCache:
+    """Test the Redis participant cache follows committed changes."""
+    
+    def test_refreshed_only_on_commit(self, make_user, django_capture_on_commit_callbacks):
+        """Test participant changes reach the cache when the transaction commits."""
+        user = make_user('test@example.com')
+        conversation = Conversation.objects.create()
+        conversation_id = str(conversation.id)
+        
+        with django_capture_on_commit_callbacks() as callbacks:
+            conversation.participants.add(user)
+        
+        assert redis_manager.is_participant(conversation_id, user.id) is None
+        
+        for callback in callbacks:
+            callback()
+        
+        assert redis_manager.is_participant(conversation_id, user.id) is True
+        redis_manager.delete_participants(conversation_id)
+    
+    def test_cleared_when_conversation_deleted(self, make_user, django_capture_on_commit_callbacks):
+        """Test deleting a conversation drops its cached participants."""
+        user = make_user('test@example.com')
+        conversation = Conversation.objects.create()
+        conversation_id = str(conversation.id)
+        with django_capture_on_commit_callbacks(execute=True):
+            conversation.participants.add(user)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            conversation.delete()
+        
+        assert redis_manager.is_participant(conversation_id, user.id) is None
+
+
+# The async ORM runs queries on a worker thread with its own connection, so
+# the test's writes can't be rolled back and need a flushing transactional test
+@pytest.mark.django_db(transaction=True)
 @pytest.mark.asyncio
 async def test_websocket_consumer():
     """Test WebSocket consumer connection."""
-    user = await User.objects.acreate(
+    user = await sync_to_async(User.objects.create_user)(
         email='test@example.com',
         first_name='Test',
-        last_name='User'
+        last_name='User',
+        password='Password123'
     )
-    user.set_password('Password123')
-    await user.asave()
     
     conversation = await Conversation.objects.acreate()
     await conversation.participants.aadd(user)
     
     # This is a basic test - full WebSocket testing would require more setup
     assert user.is_authenticated
-    assert await conversation.participants.filter(id=user.id).aexists() 
\ No newline at end of file
+    assert await conversation.participants.filter(id=user.id).aexists() 
+
+@pytest.fixture
+def in_memory_channel_layer(settings):
+    """Route channel-layer traffic through the in-process layer."""
+    settings.CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+    }
+
+
+@pytest.fixture
+async def chat_connection(in_memory_channel_layer):
+    """Factory connecting a participant's WebSocket to a new conversation."""
+    application = URLRouter([
+        re_path(r'^ws/chat/(?P<conversation_id>[^/]+)/$', ChatConsumer.as_asgi()),
+    ])
+    communicators = []
+    
+    async def _connect(user, conversation):
+        communicator = WebsocketCommunicator(application, f'/ws/chat/{conversation.id}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        assert connected
+        assert (await communicator.receive_json_from())['type'] == 'connection_established'
+        communicators.append(communicator)
+        return communicator
+    
+    yield _connect
+    
+    for communicator in communicators:
+        await communicator.disconnect()
+    if ChatConsumer._touch_flusher is not None:
+        ChatConsumer._touch_flusher.cancel()
+    await async_connection_pool.disconnect()
+
+
+async def create_conversation(*emails):
+    """Create users and a conversation with all of them as participants."""
+    users = [
+        await sync_to_async(User.objects.create_user)(
+            email=email,
+            first_name='Test',
+            last_name='User',
+            password='Password123'
+        )
+        for email in emails
+    ]
+    conversation = await Conversation.objects.acreate()
+    await conversation.participants.aadd(*users)
+    return users, conversation
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+class TestChatConsumer:
+    """Test message batching and flushing in the WebSocket consumer."""
+    
+    async def test_messages_in_one_window_are_batched(self, chat_connection, monkeypatch):
+        """Test messages sent within the flush window arrive as one batch."""
+        monkeypatch.setattr(group_send_batcher, 'window', 0.2)
+        (sender, receiver), conversation = await create_conversation(
+            'sender@example.com', 'receiver@example.com'
+        )
+        sender_ws = await chat_connection(sender, conversation)
+        receiver_ws = await chat_connection(receiver, conversation)
+        
+        for content in ('one', 'two', 'three'):
+            await sender_ws.send_json_to({'type': 'message', 'content': content})
+        
+        response = await receiver_ws.receive_json_from(timeout=2)
+        
+        assert response['type'] == 'message_batch'
+        assert [m['content'] for m in response['messages']] == ['one', 'two', 'three']
+        assert not group_send_batcher._tasks
+        redis_manager.delete_conversation(str(conversation.id))
+    
+    async def test_single_message_is_sent_unbatched(self, chat_connection):
+        """Test a lone message is delivered as a plain message frame."""
+        (user,), conversation = await create_conversation('test@example.com')
+        communicator = await chat_connection(user, conversation)
+        
+        await communicator.send_json_to({'type': 'message', 'content': 'hello'})
+        response = await communicator.receive_json_from(timeout=2)
+        
+        assert response['type'] == 'message'
+        assert response['message']['content'] == 'hello'
+        redis_manager.delete_conversation(str(conversation.id))
+    
+    async def test_buffered_messages_are_persisted_on_disconnect(self, chat_connection):
+        """Test the per-connection flusher saves queued messages before closing."""
+        (user,), conversation = await create_conversation('test@example.com')
+        communicator = await chat_connection(user, conversation)
+        
+        for content in ('one', 'two', 'three'):
+            await communicator.send_json_to({'type': 'message', 'content': content})
+        await communicator.receive_json_from(timeout=2)
+        await communicator.disconnect()
+        
+        messages = redis_manager.get_messages(str(conversation.id))
+        
+        assert sorted(m['content'] for m in messages) == ['one', 'three', 'two']
+        redis_manager.delete_conversation(str(conversation.id))
+    
+    async def test_touch_flusher_bumps_updated_at(self, chat_connection, monkeypatch):
+        """Test the touch flusher bumps updated_at for conversations with messages."""
+        monkeypatch.setattr(ChatConsumer, 'TOUCH_FLUSH_INTERVAL', 0.05)
+        monkeypatch.setattr(ChatConsumer, '_touch_flusher', None)
+        (user,), conversation = await create_conversation('test@example.com')
+        communicator = await chat_connection(user, conversation)
+        
+        await communicator.send_json_to({'type': 'message', 'content': 'hello'})
+        await communicator.receive_json_from(timeout=2)
+        await asyncio.sleep(0.3)
+        
+        refreshed = await Conversation.objects.aget(id=conversation.id)
+        
+        assert refreshed.updated_at > conversation.updated_at
+        redis_manager.delete_conversation(str(conversation.id))
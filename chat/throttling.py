@@ -1,13 +1,75 @@
 """
 Custom throttling classes for rate limiting.
 """
+import logging
+import os
+import time
+
 from rest_framework.throttling import UserRateThrottle
 
+from .redis_manager import redis_manager
+
+logger = logging.getLogger('chat')
+
+# Sliding-window log kept in a sorted set scored by request time. Trimming,
+# counting and recording happen atomically in one round-trip; rejected
+# requests are not recorded. Returns {1} when allowed, otherwise {0, oldest}
+# where oldest is the score of the earliest request still in the window.
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+if redis.call('ZCARD', key) < limit then
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('EXPIRE', key, math.ceil(window))
+    return {1}
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return {0, oldest[2]}
+"""
+
+# register_script() runs via EVALSHA and reloads the script on NOSCRIPT
+sliding_window = redis_manager.redis_client.register_script(SLIDING_WINDOW_SCRIPT)
+
 
 class MessageRateThrottle(UserRateThrottle):
     """
     Throttle for message-related endpoints.
-    Limits users to 10 requests per minute.
+    Limits users to 10 requests per minute using a Redis sliding window.
     """
     scope = 'message'
-    rate = '10/minute' 
\ No newline at end of file
+    rate = '10/minute'
+    
+    def allow_request(self, request, view):
+        """Record the request in the window if it fits under the rate."""
+        if self.rate is None:
+            return True
+        
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        
+        self.now = time.time()
+        self.oldest = None
+        try:
+            result = sliding_window(
+                keys=[self.key],
+                args=[self.now, self.duration, self.num_requests, f"{self.now}:{os.urandom(4).hex()}"]
+            )
+        except Exception as e:
+            # Fail open: an unavailable Redis shouldn't block message reads
+            logger.error(f"Error checking message rate limit: {str(e)}")
+            return True
+        
+        if result[0]:
+            return True
+        self.oldest = float(result[1])
+        return False
+    
+    def wait(self):
+        """Seconds until the oldest request leaves the window."""
+        if self.oldest is None:
+            return None
+        return max(self.duration - (self.now - self.oldest), 0)
@@ -6,13 +6,13 @@ from .views import (
     ConversationListCreateView,
     ConversationDetailView,
     ConversationMessagesView,
-    HealthCheckView,
+    health_check,
 )
 
 app_name = 'chat'
 
 urlpatterns = [
-    path('health/', HealthCheckView.as_view(), name='health'),
+    path('health/', health_check, name='health'),
     path('conversations/', ConversationListCreateView.as_view(), name='conversations'),
     path('conversations/<uuid:id>/', ConversationDetailView.as_view(), name='conversation-detail'),
     path('conversations/<uuid:conversation_id>/messages/', ConversationMessagesView.as_view(), name='messages'),
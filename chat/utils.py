@@ -0,0 +1,41 @@
+"""
+Utility helpers for the chat application.
+"""
+import os
+import time
+import uuid
+
+# Random bytes are drawn from a pre-filled pool so generating an id does not
+# cost an os.urandom() call per message.
+_ENTROPY_POOL_SIZE = 4096
+_ENTROPY_POOL = os.urandom(_ENTROPY_POOL_SIZE)
+_POOL_OFFSET = 0
+
+
+def _random_bytes(n):
+    """Take ``n`` bytes from the entropy pool, refilling it when exhausted."""
+    global _ENTROPY_POOL, _POOL_OFFSET
+    if _POOL_OFFSET + n > _ENTROPY_POOL_SIZE:
+        _ENTROPY_POOL = os.urandom(_ENTROPY_POOL_SIZE)
+        _POOL_OFFSET = 0
+    chunk = _ENTROPY_POOL[_POOL_OFFSET:_POOL_OFFSET + n]
+    _POOL_OFFSET += n
+    return chunk
+
+
+def generate_message_id(timestamp=None):
+    """
+    Generate a time-ordered UUIDv7 string for a message.
+    The leading 48 bits hold the Unix time in milliseconds, so ids sort by
+    creation time; the remaining bits are random.
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    
+    rand = int.from_bytes(_random_bytes(10), 'big')
+    value = (int(timestamp * 1000) & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76                          # version
+    value |= ((rand >> 62) & 0xFFF) << 64       # rand_a
+    value |= 0x2 << 62                          # RFC 4122 variant
+    value |= rand & 0x3FFFFFFFFFFFFFFF          # rand_b
+    return str(uuid.UUID(int=value))
@@ -6,10 +6,15 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.throttling import UserRateThrottle
 from django.db import transaction
-from django.db.models import Q
+from django.http import HttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_safe
+from django.db.models import Count, Prefetch, Q
 import logging
 
-from .models import Conversation
+from .models import Conversation, build_display_name
+from users.models import User, full_name_expression
+from users.serializers import USER_COLUMNS, UserRowSerializer, format_datetime
 from .serializers import ConversationSerializer, MessageSerializer
 from .redis_manager import redis_manager
 from .throttling import MessageRateThrottle
@@ -17,6 +22,66 @@ from .throttling import MessageRateThrottle
 logger = logging.getLogger('api')
 
 
+# Columns needed to serialize conversations and their participants
+CONVERSATION_FIELDS = ('id', 'name', 'is_group', 'created_at', 'updated_at')
+PARTICIPANT_FIELDS = USER_COLUMNS
+PARTICIPANT_ROW_FIELDS = (*PARTICIPANT_FIELDS, 'full_name')
+
+
+def participant_conversations(user):
+    """Conversations the user takes part in, loading only serialized columns."""
+    return Conversation.objects.filter(
+        participants=user
+    ).only(*CONVERSATION_FIELDS).prefetch_related(
+        Prefetch(
+            'participants',
+            queryset=User.objects.only(*PARTICIPANT_FIELDS)
+        )
+    )
+
+
+def conversation_list_rows(user):
+    """
+    Build the conversation list payload from values() rows.
+    Produces the same shape as ConversationSerializer without running it per
+    conversation; participants are fetched in one batched query.
+    """
+    conversations = list(
+        Conversation.objects.filter(participants=user).values(*CONVERSATION_FIELDS)
+    )
+    participants = {conv['id']: [] for conv in conversations}
+    participant_rows = Conversation.participants.through.objects.filter(
+        conversation_id__in=participants
+    ).annotate(
+        full_name=full_name_expression('user__')
+    ).order_by('id').values_list(
+        'conversation_id', *(f'user__{field}' for field in PARTICIPANT_FIELDS), 'full_name'
+    )
+    participant_serializer = UserRowSerializer()
+    for conversation_id, *row in participant_rows:
+        participants[conversation_id].append(
+            participant_serializer.to_value(dict(zip(PARTICIPANT_ROW_FIELDS, row)))
+        )
+    
+    rows = []
+    for conv in conversations:
+        conv_participants = participants[conv['id']]
+        rows.append({
+            'id': str(conv['id']),
+            'name': conv['name'],
+            'participants': conv_participants,
+            'display_name': build_display_name(
+                conv['name'],
+                conv['is_group'],
+                [p['first_name'] for p in conv_participants]
+            ),
+            'is_group': conv['is_group'],
+            'created_at': format_datetime(conv['created_at']),
+            'updated_at': format_datetime(conv['updated_at']),
+        })
+    return rows
+
+
 class ConversationListCreateView(generics.ListCreateAPIView):
     """API endpoint for listing and creating conversations."""
     
@@ -25,9 +90,7 @@ class ConversationListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         """Return conversations where user is a participant."""
         if self.request.user.is_authenticated:
-            return Conversation.objects.filter(
-                participants=self.request.user
-            ).prefetch_related('participants')
+            return participant_conversations(self.request.user)
         return Conversation.objects.none()
     
     def list(self, request, *args, **kwargs):
@@ -38,18 +101,14 @@ class ConversationListCreateView(generics.ListCreateAPIView):
                 'message': 'Authentication required'
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        conversations_data = conversation_list_rows(request.user)
         
-        # Add message counts and unread counts
-        conversations_data = []
-        for conv_data, conv in zip(serializer.data, queryset):
-            conv_data['message_count'] = redis_manager.get_message_count(str(conv.id))
-            conv_data['unread_count'] = redis_manager.get_unread_count(
-                str(conv.id),
-                request.user.id
-            )
-            conversations_data.append(conv_data)
+        # Add message counts and unread counts (one Redis round-trip)
+        conversation_ids = [conv_data['id'] for conv_data in conversations_data]
+        counts = redis_manager.get_counts_bulk(conversation_ids, request.user.id)
+        
+        for conv_data in conversations_data:
+            conv_data['message_count'], conv_data['unread_count'] = counts[conv_data['id']]
         
         logger.info(f"User {request.user.id} listed conversations")
         
@@ -73,12 +132,20 @@ class ConversationListCreateView(generics.ListCreateAPIView):
         
         # Check if conversation already exists (for non-group chats)
         if len(participant_ids) == 2:
+            # Only look at the first user's conversations, and match the one
+            # whose participants are exactly these two users
+            user_conversation_ids = Conversation.participants.through.objects.filter(
+                user_id=participant_ids[0]
+            ).values('conversation_id')
             existing_conv = Conversation.objects.filter(
-                is_group=False
-            ).filter(
-                participants__id=participant_ids[0]
+                is_group=False,
+                id__in=user_conversation_ids
+            ).annotate(
+                matched=Count('participants', filter=Q(participants__in=participant_ids), distinct=True),
+                total=Count('participants', distinct=True)
             ).filter(
-                participants__id=participant_ids[1]
+                matched=2,
+                total=2
             ).first()
             
             if existing_conv:
@@ -89,11 +156,17 @@ class ConversationListCreateView(generics.ListCreateAPIView):
                     'data': ConversationSerializer(existing_conv).data
                 }, status=status.HTTP_200_OK)
         
-        # Create new conversation
-        data = request.data.copy()
-        data['participant_ids'] = participant_ids
+        # Create new conversation. Resolve the participants once here so the
+        # serializer can validate and add them without querying again.
+        data = {**request.data, 'participant_ids': participant_ids}
+        participants = None
+        if all(isinstance(pid, int) for pid in participant_ids):
+            participants = list(User.objects.filter(id__in=participant_ids).only('id'))
         
-        serializer = self.get_serializer(data=data)
+        serializer = self.get_serializer(
+            data=data,
+            context={**self.get_serializer_context(), 'participants': participants}
+        )
         if serializer.is_valid():
             try:
                 with transaction.atomic():
@@ -103,7 +176,7 @@ class ConversationListCreateView(generics.ListCreateAPIView):
                     return Response({
                         'status': 'success',
                         'message': 'Conversation created successfully',
-                        'data': ConversationSerializer(conversation).data
+                        'data': serializer.data
                     }, status=status.HTTP_201_CREATED)
             except Exception as e:
                 logger.error(f"Error creating conversation: {str(e)}")
@@ -129,9 +202,7 @@ class ConversationDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         """Return conversations where user is a participant."""
         if self.request.user.is_authenticated:
-            return Conversation.objects.filter(
-                participants=self.request.user
-            ).prefetch_related('participants')
+            return participant_conversations(self.request.user)
         return Conversation.objects.none()
     
     def retrieve(self, request, *args, **kwargs):
@@ -147,8 +218,7 @@ class ConversationDetailView(generics.RetrieveAPIView):
             serializer = self.get_serializer(conversation)
             
             data = serializer.data
-            data['message_count'] = redis_manager.get_message_count(str(conversation.id))
-            data['unread_count'] = redis_manager.get_unread_count(
+            data['message_count'], data['unread_count'] = redis_manager.get_conv_meta(
                 str(conversation.id),
                 request.user.id
             )
@@ -171,6 +241,28 @@ class ConversationMessagesView(APIView):
     
     throttle_classes = [MessageRateThrottle]
     
+    @staticmethod
+    def is_participant(conversation_id, user_id):
+        """
+        Check membership against the Redis participant cache, falling back
+        to the database (and warming the cache) when it is cold.
+        Returns None when no participants were found at all, i.e. the
+        conversation may not exist.
+        """
+        is_member = redis_manager.is_participant(str(conversation_id), user_id)
+        if is_member is not None:
+            return is_member
+        
+        user_ids = list(
+            Conversation.participants.through.objects.filter(
+                conversation_id=conversation_id
+            ).values_list('user_id', flat=True)
+        )
+        if not user_ids:
+            return None
+        redis_manager.set_participants(str(conversation_id), user_ids)
+        return user_id in user_ids
+    
     def get(self, request, conversation_id):
         """Retrieve messages for a conversation."""
         if not request.user.is_authenticated:
@@ -179,22 +271,23 @@ class ConversationMessagesView(APIView):
                 'message': 'Authentication required'
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        # Verify user is participant
-        try:
-            conversation = Conversation.objects.get(id=conversation_id)
-            if not conversation.participants.filter(id=request.user.id).exists():
-                logger.warning(
-                    f"User {request.user.id} attempted to access conversation {conversation_id} without permission"
-                )
+        # Verify user is participant. A known participant set implies the
+        # conversation exists, so only the empty case needs an EXISTS query
+        # to tell 404 from 403.
+        is_member = self.is_participant(conversation_id, request.user.id)
+        if not is_member:
+            if is_member is None and not Conversation.objects.filter(id=conversation_id).exists():
                 return Response({
                     'status': 'error',
-                    'message': 'You are not a participant in this conversation'
-                }, status=status.HTTP_403_FORBIDDEN)
-        except Conversation.DoesNotExist:
+                    'message': 'Conversation not found'
+                }, status=status.HTTP_404_NOT_FOUND)
+            logger.warning(
+                f"User {request.user.id} attempted to access conversation {conversation_id} without permission"
+            )
             return Response({
                 'status': 'error',
-                'message': 'Conversation not found'
-            }, status=status.HTTP_404_NOT_FOUND)
+                'message': 'You are not a participant in this conversation'
+            }, status=status.HTTP_403_FORBIDDEN)
         
         # Get pagination parameters
         limit = int(request.query_params.get('limit', 50))
@@ -208,15 +301,14 @@ class ConversationMessagesView(APIView):
         if offset < 0:
             offset = 0
         
-        # Retrieve messages from Redis
-        messages = redis_manager.get_latest_messages(
+        # Retrieve messages and total count and reset the unread count in
+        # one Redis round-trip
+        messages, total = redis_manager.fetch_page(
             str(conversation_id),
+            request.user.id,
             limit=limit
         )
         
-        # Reset unread count
-        redis_manager.reset_unread_count(str(conversation_id), request.user.id)
-        
         logger.info(
             f"User {request.user.id} retrieved {len(messages)} messages from conversation {conversation_id}"
         )
@@ -227,17 +319,17 @@ class ConversationMessagesView(APIView):
                 'conversation_id': str(conversation_id),
                 'messages': messages,
                 'count': len(messages),
-                'total': redis_manager.get_message_count(str(conversation_id))
+                'total': total
             }
         }, status=status.HTTP_200_OK)
 
 
-class HealthCheckView(APIView):
-    """Health check endpoint."""
-    
-    def get(self, request):
-        """Return health status."""
-        return Response({
-            'status': 'success',
-            'message': 'API is running'
-        }, status=status.HTTP_200_OK) 
\ No newline at end of file
+# The health payload never changes, so it is serialized once at import
+_HEALTH_BODY = b'{"status":"success","message":"API is running"}'
+
+
+@require_safe
+@cache_control(max_age=5)
+def health_check(request):
+    """Health check endpoint; bypasses DRF negotiation and rendering."""
+    return HttpResponse(_HEALTH_BODY, content_type='application/json')
@@ -3,26 +3,51 @@ Pytest configuration and fixtures.
 """
 import pytest
 from django.conf import settings
+from django.db import connections
 import os
 
 # Set Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chat_project.settings')
 
+# TEST_FAST=1 runs the suite against an in-memory SQLite database for quick
+# local iteration; CI keeps the default PostgreSQL test database.
+TEST_FAST = os.getenv('TEST_FAST') == '1'
 
-@pytest.fixture(scope='session')
-def django_db_setup():
-    """Set up database for tests."""
-    settings.DATABASES['default'] = {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'test_chatdb',
-        'USER': os.getenv('DB_USER', 'chatuser'),
-        'PASSWORD': os.getenv('DB_PASSWORD', 'chatpassword'),
-        'HOST': os.getenv('DB_HOST', 'localhost'),
-        'PORT': os.getenv('DB_PORT', '5432'),
-    }
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    """Point the test run at the selected database."""
+    # Update the dict in place: Django's connection handler already holds it
+    db_settings = settings.DATABASES['default']
+    if TEST_FAST:
+        db_settings.update({
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        })
+        # Model loading already built a PostgreSQL wrapper; drop it so the
+        # next access picks up the SQLite backend
+        del connections['default']
+    else:
+        db_settings['TEST'] = {'NAME': 'test_chatdb'}
 
 
 @pytest.fixture(autouse=True)
-def enable_db_access_for_all_tests(db):
-    """Enable database access for all tests."""
-    pass 
\ No newline at end of file
+def fast_password_hashing(settings):
+    """Use a cheap password hasher so creating users doesn't dominate test time."""
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@pytest.fixture
+def make_user(db):
+    """Factory fixture for creating users with sensible defaults."""
+    from users.models import User
+    
+    def _make_user(email, password='Password123', first_name='Test', last_name='User'):
+        return User.objects.create_user(
+            email=email,
+            first_name=first_name,
+            last_name=last_name,
+            password=password
+        )
+    
+    return _make_user
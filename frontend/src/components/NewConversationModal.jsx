@@ -18,10 +18,20 @@ export default function NewConversationModal({
 
   const loadUsers = async () => {
     try {
-      const response = await authAPI.getUsers();
-      if (response.data.status === "success") {
-        setUsers(response.data.data);
-      }
+      // The user list is cursor-paginated; follow `next` until the last page
+      const allUsers = [];
+      let cursor = null;
+      do {
+        const response = await authAPI.getUsers(cursor ? { cursor } : {});
+        if (response.data.status !== "success") {
+          break;
+        }
+        allUsers.push(...response.data.data);
+        cursor = response.data.next
+          ? new URL(response.data.next).searchParams.get("cursor")
+          : null;
+      } while (cursor);
+      setUsers(allUsers);
     } catch (error) {
       setError("Failed to load users");
     } finally {
@@ -39,7 +39,7 @@ export const authAPI = {
   login: (data) => api.post("/users/login/", data),
   logout: () => api.post("/users/logout/"),
   getProfile: () => api.get("/users/profile/"),
-  getUsers: () => api.get("/users/list/"),
+  getUsers: (params) => api.get("/users/list/", { params }),
 };
 
 // Chat API
@@ -1,3 +1,5 @@
+import { decode, encode } from "@msgpack/msgpack";
+
 class WebSocketService {
   constructor() {
     this.socket = null;
@@ -16,9 +18,10 @@ class WebSocketService {
     this.conversationId = conversationId;
     const wsUrl = `${
       import.meta.env.VITE_WS_URL || "ws://localhost:8000"
-    }/ws/chat/${conversationId}/`;
+    }/ws/chat/${conversationId}/?encoding=msgpack`;
 
     this.socket = new WebSocket(wsUrl);
+    this.socket.binaryType = "arraybuffer";
 
     this.socket.onopen = () => {
       console.log("WebSocket connected");
@@ -27,7 +30,10 @@ class WebSocketService {
 
     this.socket.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data);
+        const data =
+          typeof event.data === "string"
+            ? JSON.parse(event.data)
+            : decode(new Uint8Array(event.data));
         this.handleMessage(data);
       } catch (error) {
         console.error("Error parsing WebSocket message:", error);
@@ -50,6 +56,11 @@ class WebSocketService {
       case "message":
         this.messageHandlers.forEach((handler) => handler(data.message));
         break;
+      case "message_batch":
+        data.messages.forEach((message) =>
+          this.messageHandlers.forEach((handler) => handler(message))
+        );
+        break;
       case "typing":
         this.typingHandlers.forEach((handler) => handler(data));
         break;
@@ -68,7 +79,7 @@ class WebSocketService {
   sendMessage(content) {
     if (this.socket && this.socket.readyState === WebSocket.OPEN) {
       this.socket.send(
-        JSON.stringify({
+        encode({
           type: "message",
           content: content,
         })
@@ -81,7 +92,7 @@ class WebSocketService {
   sendTyping(isTyping) {
     if (this.socket && this.socket.readyState === WebSocket.OPEN) {
       this.socket.send(
-        JSON.stringify({
+        encode({
           type: "typing",
           is_typing: isTyping,
         })
@@ -92,7 +103,7 @@ class WebSocketService {
   sendReadReceipt() {
     if (this.socket && this.socket.readyState === WebSocket.OPEN) {
       this.socket.send(
-        JSON.stringify({
+        encode({
           type: "read",
         })
       );
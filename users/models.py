@@ -2,8 +2,26 @@
 User models for the chat application.
 """
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Concat
 from django.utils import timezone
+import logging
+
+logger = logging.getLogger('api')
+
+# Repeated logins within this many seconds share one last_seen write
+LAST_SEEN_DEBOUNCE = 30
+
+
+def full_name_expression(prefix=''):
+    """
+    SQL expression for "<first_name> <last_name>", so values() querysets
+    can select full_name instead of building it per row in Python.
+    Pass a relation prefix such as 'user__' to use it across a join.
+    """
+    return Concat(f'{prefix}first_name', Value(' '), f'{prefix}last_name')
 
 
 class UserManager(BaseUserManager):
@@ -63,6 +81,10 @@ class User(AbstractBaseUser, PermissionsMixin):
         db_table = 'users'
         verbose_name = 'user'
         verbose_name_plural = 'users'
+        indexes = [
+            # Serves the user list's cursor ordering
+            models.Index(fields=['-date_joined', '-id'], name='users_date_joined_id_idx'),
+        ]
     
     def __str__(self):
         return self.email
@@ -71,6 +93,11 @@ class User(AbstractBaseUser, PermissionsMixin):
         """Return the user's full name."""
         return f"{self.first_name} {self.last_name}"
     
+    @property
+    def full_name(self):
+        """Full name, always built from the current first and last name."""
+        return self.get_full_name()
+    
     def get_short_name(self):
         """Return the user's first name."""
         return self.first_name
@@ -78,4 +105,24 @@ class User(AbstractBaseUser, PermissionsMixin):
     def update_last_seen(self):
         """Update the last seen timestamp."""
         self.last_seen = timezone.now()
-        self.save(update_fields=['last_seen']) 
\ No newline at end of file
+        self.save(update_fields=['last_seen'])
+    
+    def defer_last_seen_update(self):
+        """
+        Set last_seen on this instance and write it once the current
+        transaction commits, skipping the write if one ran within
+        LAST_SEEN_DEBOUNCE seconds.
+        """
+        self.last_seen = last_seen = timezone.now()
+        pk = self.pk
+        
+        def write():
+            try:
+                if not cache.add(f"user:{pk}:last_seen", 1, timeout=LAST_SEEN_DEBOUNCE):
+                    return
+            except Exception as e:
+                # Without the debounce key just write every time
+                logger.error(f"Error checking last_seen debounce: {str(e)}")
+            User.objects.filter(pk=pk).update(last_seen=last_seen)
+        
+        transaction.on_commit(write) 
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""
+Pagination classes for user endpoints.
+"""
+from rest_framework import status
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class UserCursorPagination(CursorPagination):
+    """
+    Cursor pagination for the user list, newest users first, with id
+    breaking ties between users who joined at the same instant.
+    Keeps the API's {'status', 'data'} envelope and adds next/previous links.
+    """
+    page_size = 50
+    ordering = ('-date_joined', '-id')
+    
+    def get_paginated_response(self, data):
+        """Wrap a page of results in the standard response envelope."""
+        return Response({
+            'status': 'success',
+            'data': data,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link()
+        }, status=status.HTTP_200_OK)
@@ -3,8 +3,22 @@ Serializers for user models.
 """
 from rest_framework import serializers
 from django.core.validators import EmailValidator
+from django.db import IntegrityError, models, transaction
+import serpy
+
 from .models import User
 
+# Built once at import instead of on every validation call
+_EMAIL_VALIDATOR = EmailValidator()
+_SPACE_STRIP = str.maketrans('', '', ' ')
+
+_DATETIME_FIELD = serializers.DateTimeField()
+
+
+def format_datetime(value):
+    """Format a datetime the same way DRF's DateTimeField does."""
+    return _DATETIME_FIELD.to_representation(value)
+
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """Serializer for user registration."""
@@ -26,29 +40,26 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'email', 'first_name', 'last_name', 'password', 'password_confirm']
         extra_kwargs = {
+            # Uniqueness is enforced by the database index; see create()
+            'email': {'validators': []},
             'first_name': {'required': True, 'min_length': 2},
             'last_name': {'required': True, 'min_length': 2},
         }
     
     def validate_email(self, value):
-        """Validate email format and uniqueness."""
-        validator = EmailValidator()
-        validator(value)
-        
-        if User.objects.filter(email=value.lower()).exists():
-            raise serializers.ValidationError('A user with this email already exists.')
-        
+        """Validate email format."""
+        _EMAIL_VALIDATOR(value)
         return value.lower()
     
     def validate_first_name(self, value):
         """Validate first name."""
-        if not value.replace(' ', '').isalpha():
+        if not value.translate(_SPACE_STRIP).isalpha():
             raise serializers.ValidationError('First name should contain only letters.')
         return value.strip()
     
     def validate_last_name(self, value):
         """Validate last name."""
-        if not value.replace(' ', '').isalpha():
+        if not value.translate(_SPACE_STRIP).isalpha():
             raise serializers.ValidationError('Last name should contain only letters.')
         return value.strip()
     
@@ -63,28 +74,94 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         """Create a new user."""
         validated_data.pop('password_confirm')
-        user = User.objects.create_user(
-            email=validated_data['email'],
-            first_name=validated_data['first_name'],
-            last_name=validated_data['last_name'],
-            password=validated_data['password']
-        )
+        try:
+            # Savepoint so a duplicate doesn't break the request transaction
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    email=validated_data['email'],
+                    first_name=validated_data['first_name'],
+                    last_name=validated_data['last_name'],
+                    password=validated_data['password']
+                )
+        except IntegrityError:
+            raise serializers.ValidationError({
+                'email': ['A user with this email already exists.']
+            })
         return user
 
 
+class UserListSerializer(serializers.ListSerializer):
+    """
+    List serializer for users.
+    Serializes every item through the single shared child serializer into a
+    plain list; no per-item serializer instances are created.
+    """
+    
+    def to_representation(self, data):
+        """Serialize each user with the child's representation."""
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        to_representation = self.child.to_representation
+        return [to_representation(item) for item in iterable]
+
+
+# Database columns UserSerializer reads (full_name is derived). Pass these
+# to only()/values() so password hashes and permission flags aren't loaded.
+USER_COLUMNS = ('id', 'email', 'first_name', 'last_name', 'last_seen', 'date_joined')
+
+
+class FormattedDateTimeField(serpy.Field):
+    """serpy field that renders datetimes like DRF's DateTimeField."""
+    
+    def to_value(self, value):
+        """Format the datetime, passing None through."""
+        return format_datetime(value)
+
+
+class UserPayloadSerializer(serpy.Serializer):
+    """
+    The user payload returned by every endpoint, read from model instances.
+    This is the only definition of its fields; UserSerializer and
+    UserRowSerializer both emit it.
+    """
+    
+    id = serpy.IntField()
+    email = serpy.StrField()
+    first_name = serpy.StrField()
+    last_name = serpy.StrField()
+    full_name = serpy.StrField()
+    last_seen = FormattedDateTimeField()
+    date_joined = FormattedDateTimeField()
+
+
+class UserRowSerializer(serpy.DictSerializer, UserPayloadSerializer):
+    """
+    The user payload read from values() rows with plain key lookups,
+    so read-only lists don't build model instances.
+    """
+
+
+_USER_PAYLOAD = UserPayloadSerializer()
+
+
+def serialize_user(user):
+    """Serialize a single user instance into the user payload."""
+    return _USER_PAYLOAD.to_value(user)
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for user data."""
     
-    full_name = serializers.SerializerMethodField()
+    full_name = serializers.CharField(read_only=True)
     
     class Meta:
         model = User
         fields = ['id', 'email', 'first_name', 'last_name', 'full_name', 'last_seen', 'date_joined']
         read_only_fields = ['id', 'date_joined', 'last_seen']
+        list_serializer_class = UserListSerializer
     
-    def get_full_name(self, obj):
-        """Get user's full name."""
-        return obj.get_full_name()
+    def to_representation(self, instance):
+        """Emit the shared user payload rather than walking DRF fields."""
+        return serialize_user(instance)
 
 
 class UserLoginSerializer(serializers.Serializer):
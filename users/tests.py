@@ -2,10 +2,12 @@
 Tests for users app.
 """
 import pytest
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from users.models import User
+from chat.renderers import ORJSONRenderer
 
 
 @pytest.mark.django_db
@@ -70,15 +72,62 @@ class TestUserRegistration:
         
         assert response.status_code == status.HTTP_400_BAD_REQUEST
     
-    def test_registration_duplicate_email(self):
+    def test_registration_duplicate_email(self, make_user):
         """Test registration with duplicate email."""
         # Create a user first
-        User.objects.create_user(
-            email='test@example.com',
-            first_name='Jane',
-            last_name='Smith',
-            password='Password123'
-        )
+        make_user('test@example.com')
+        
+        client = APIClient()
+        url = reverse('users:register')
+        
+        data = {
+            'email': 'test@example.com',
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'password': 'SecurePassword123',
+            'password_confirm': 'SecurePassword123'
+        }
+        
+        try:
+            response = client.post(url, data, format='json')
+        finally:
+            cache.delete('user-exists:test@example.com')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'email' in response.data['errors']
+    
+    def test_repeat_registration_rejected_early(self, monkeypatch):
+        """Test re-posting a just-registered email is rejected before validation."""
+        client = APIClient()
+        url = reverse('users:register')
+        
+        data = {
+            'email': 'test@example.com',
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'password': 'SecurePassword123',
+            'password_confirm': 'SecurePassword123'
+        }
+        
+        try:
+            assert client.post(url, data, format='json').status_code == status.HTTP_201_CREATED
+            
+            def fail_if_validated(*args, **kwargs):
+                pytest.fail('duplicate registration reached the serializer')
+            
+            monkeypatch.setattr('users.views.UserRegistrationSerializer', fail_if_validated)
+            response = client.post(url, data, format='json')
+        finally:
+            cache.delete('user-exists:test@example.com')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['errors']['email'] == ['A user with this email already exists.']
+    
+    def test_registration_duplicate_email_on_insert(self, make_user, monkeypatch):
+        """Test a duplicate caught by the unique index reports a list of errors."""
+        make_user('test@example.com')
+        # Skip the early lookup so the insert hits the unique index
+        monkeypatch.setattr('users.views.email_registered', lambda email: False)
         
         client = APIClient()
         url = reverse('users:register')
@@ -94,21 +143,17 @@ class TestUserRegistration:
         response = client.post(url, data, format='json')
         
         assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['errors']['email'] == ['A user with this email already exists.']
 
 
 @pytest.mark.django_db
 class TestUserLogin:
     """Test user login."""
     
-    def test_successful_login(self):
+    def test_successful_login(self, make_user):
         """Test successful user login."""
         # Create a user
-        user = User.objects.create_user(
-            email='test@example.com',
-            first_name='John',
-            last_name='Doe',
-            password='SecurePassword123'
-        )
+        user = make_user('test@example.com', password='SecurePassword123')
         
         client = APIClient()
         url = reverse('users:login')
@@ -121,18 +166,37 @@ class TestUserLogin:
         response = client.post(url, data, format='json')
         
         assert response.status_code == status.HTTP_200_OK
+        assert isinstance(response.accepted_renderer, ORJSONRenderer)
         assert response.data['status'] == 'success'
         assert response.data['data']['email'] == 'test@example.com'
     
-    def test_login_invalid_credentials(self):
+    def test_login_updates_last_seen_on_commit(self, make_user, django_capture_on_commit_callbacks):
+        """Test login writes last_seen once the request transaction commits."""
+        user = make_user('test@example.com', password='SecurePassword123')
+        cache.delete(f"user:{user.pk}:last_seen")
+        
+        client = APIClient()
+        url = reverse('users:login')
+        
+        data = {
+            'email': 'test@example.com',
+            'password': 'SecurePassword123'
+        }
+        
+        try:
+            with django_capture_on_commit_callbacks(execute=True):
+                response = client.post(url, data, format='json')
+        finally:
+            cache.delete(f"user:{user.pk}:last_seen")
+        
+        assert response.status_code == status.HTTP_200_OK
+        user.refresh_from_db()
+        assert user.last_seen is not None
+    
+    def test_login_invalid_credentials(self, make_user):
         """Test login with invalid credentials."""
         # Create a user
-        User.objects.create_user(
-            email='test@example.com',
-            first_name='John',
-            last_name='Doe',
-            password='SecurePassword123'
-        )
+        make_user('test@example.com', password='SecurePassword123')
         
         client = APIClient()
         url = reverse('users:login')
@@ -145,20 +209,45 @@ class TestUserLogin:
         response = client.post(url, data, format='json')
         
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_login_unknown_email(self):
+        """Test login with an email that has no account."""
+        client = APIClient()
+        url = reverse('users:login')
+        
+        data = {
+            'email': 'nobody@example.com',
+            'password': 'SecurePassword123'
+        }
+        
+        response = client.post(url, data, format='json')
+        
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.data['status'] == 'error'
+
+
+@pytest.mark.django_db
+class TestUserModel:
+    """Test the user model."""
+    
+    def test_full_name_follows_name_changes(self, make_user):
+        """Test full_name reflects names changed after first access."""
+        user = make_user('test@example.com', first_name='Old', last_name='Name')
+        assert user.full_name == 'Old Name'
+        
+        user.first_name = 'New'
+        user.save()
+        
+        assert user.full_name == 'New Name'
 
 
 @pytest.mark.django_db
 class TestUserProfile:
     """Test user profile retrieval."""
     
-    def test_get_profile_authenticated(self):
+    def test_get_profile_authenticated(self, make_user):
         """Test getting profile when authenticated."""
-        user = User.objects.create_user(
-            email='test@example.com',
-            first_name='John',
-            last_name='Doe',
-            password='SecurePassword123'
-        )
+        user = make_user('test@example.com', password='SecurePassword123')
         
         client = APIClient()
         client.force_authenticate(user=user)
@@ -176,4 +265,35 @@ class TestUserProfile:
         url = reverse('users:profile')
         response = client.get(url)
         
-        assert response.status_code == status.HTTP_401_UNAUTHORIZED 
\ No newline at end of file
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestUserList:
+    """Test listing users."""
+    
+    def test_list_users_paginated(self, make_user):
+        """Test the user list is cursor-paginated and excludes the current user."""
+        user = make_user('test@example.com')
+        for i in range(51):
+            make_user(f'user{i}@example.com')
+        
+        client = APIClient()
+        client.force_authenticate(user=user)
+        
+        url = reverse('users:list')
+        response = client.get(url)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['status'] == 'success'
+        assert len(response.data['data']) == 50
+        assert response.data['previous'] is None
+        emails = [u['email'] for u in response.data['data']]
+        
+        response = client.get(response.data['next'])
+        
+        assert len(response.data['data']) == 1
+        assert response.data['next'] is None
+        emails += [u['email'] for u in response.data['data']]
+        assert len(set(emails)) == 51
+        assert 'test@example.com' not in emails
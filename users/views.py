@@ -1,50 +1,104 @@
 """
 Views for user management.
 """
-from rest_framework import status, generics
+from rest_framework import serializers, status, generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import authenticate, login, logout
-from django.db import transaction
+from django.core.cache import cache
 import logging
 
-from .models import User
+from .models import User, full_name_expression
+from .pagination import UserCursorPagination
 from .serializers import (
     UserRegistrationSerializer,
     UserSerializer,
-    UserLoginSerializer
+    UserLoginSerializer,
+    UserRowSerializer,
+    USER_COLUMNS,
+    serialize_user
 )
 
 logger = logging.getLogger('api')
 
+# Seconds to remember that an email is registered, so repeated sign-up
+# attempts for the same address don't each query the database. Only
+# positive answers are cached; an unknown email may register at any moment.
+EMAIL_EXISTS_TTL = 30
+
+
+def _email_exists_key(email):
+    """Cache key marking an email as registered."""
+    return f"user-exists:{email}"
+
+
+def remember_email_registered(email):
+    """Mark an email as registered in the cache."""
+    try:
+        cache.set(_email_exists_key(email), True, EMAIL_EXISTS_TTL)
+    except Exception as e:
+        logger.error("Error writing email cache: %s", e)
+
+
+def email_registered(email):
+    """Return whether an account uses this email, caching positive answers."""
+    try:
+        if cache.get(_email_exists_key(email)):
+            return True
+    except Exception as e:
+        logger.error("Error reading email cache: %s", e)
+    
+    exists = User.objects.filter(email=email).exists()
+    if exists:
+        remember_email_registered(email)
+    return exists
+
 
 class UserRegistrationView(APIView):
     """API endpoint for user registration."""
     
     def post(self, request):
         """Register a new user."""
-        logger.info(f"User registration attempt: {request.data.get('email', 'N/A')}")
+        logger.info("User registration attempt: %s", request.data.get('email', 'N/A'))
+        
+        # Reject known emails before validation and password hashing run
+        email = request.data.get('email')
+        if isinstance(email, str) and email_registered(email.lower()):
+            logger.warning("User registration for existing email: %s", email)
+            return Response({
+                'status': 'error',
+                'message': 'Validation failed',
+                'errors': {'email': ['A user with this email already exists.']}
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             try:
-                with transaction.atomic():
-                    user = serializer.save()
-                    logger.info(f"User registered successfully: {user.email}")
-                    
-                    return Response({
-                        'status': 'success',
-                        'message': 'User registered successfully',
-                        'data': UserSerializer(user).data
-                    }, status=status.HTTP_201_CREATED)
+                user = serializer.save()
+                remember_email_registered(user.email)
+                logger.info("User registered successfully: %s", user.email)
+                
+                return Response({
+                    'status': 'success',
+                    'message': 'User registered successfully',
+                    'data': serialize_user(user)
+                }, status=status.HTTP_201_CREATED)
+            except serializers.ValidationError as e:
+                logger.warning("User registration validation failed: %s", e.detail)
+                return Response({
+                    'status': 'error',
+                    'message': 'Validation failed',
+                    'errors': e.detail
+                }, status=status.HTTP_400_BAD_REQUEST)
             except Exception as e:
-                logger.error(f"Error during user registration: {str(e)}")
+                logger.error("Error during user registration: %s", e)
                 return Response({
                     'status': 'error',
                     'message': 'An error occurred during registration'
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        logger.warning(f"User registration validation failed: {serializer.errors}")
+        logger.warning("User registration validation failed: %s", serializer.errors)
         return Response({
             'status': 'error',
             'message': 'Validation failed',
@@ -57,7 +111,7 @@ class UserLoginView(APIView):
     
     def post(self, request):
         """Authenticate and login a user."""
-        logger.info(f"Login attempt: {request.data.get('email', 'N/A')}")
+        logger.info("Login attempt: %s", request.data.get('email', 'N/A'))
         
         serializer = UserLoginSerializer(data=request.data)
         if serializer.is_valid():
@@ -68,16 +122,16 @@ class UserLoginView(APIView):
             
             if user is not None:
                 login(request, user)
-                user.update_last_seen()
-                logger.info(f"User logged in successfully: {user.email}")
+                user.defer_last_seen_update()
+                logger.info("User logged in successfully: %s", user.email)
                 
                 return Response({
                     'status': 'success',
                     'message': 'Login successful',
-                    'data': UserSerializer(user).data
+                    'data': serialize_user(user)
                 }, status=status.HTTP_200_OK)
             else:
-                logger.warning(f"Failed login attempt: {email}")
+                logger.warning("Failed login attempt: %s", email)
                 return Response({
                     'status': 'error',
                     'message': 'Invalid email or password'
@@ -93,37 +147,29 @@ class UserLoginView(APIView):
 class UserLogoutView(APIView):
     """API endpoint for user logout."""
     
+    permission_classes = (IsAuthenticated,)
+    
     def post(self, request):
         """Logout the current user."""
-        if request.user.is_authenticated:
-            logger.info(f"User logged out: {request.user.email}")
-            logout(request)
-            return Response({
-                'status': 'success',
-                'message': 'Logout successful'
-            }, status=status.HTTP_200_OK)
-        
+        logger.info("User logged out: %s", request.user.email)
+        logout(request)
         return Response({
-            'status': 'error',
-            'message': 'No user is currently logged in'
-        }, status=status.HTTP_400_BAD_REQUEST)
+            'status': 'success',
+            'message': 'Logout successful'
+        }, status=status.HTTP_200_OK)
 
 
 class UserProfileView(APIView):
     """API endpoint for user profile."""
     
+    permission_classes = (IsAuthenticated,)
+    
     def get(self, request):
         """Get current user's profile."""
-        if not request.user.is_authenticated:
-            return Response({
-                'status': 'error',
-                'message': 'Authentication required'
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        
-        logger.info(f"Profile accessed: {request.user.email}")
+        logger.info("Profile accessed: %s", request.user.email)
         return Response({
             'status': 'success',
-            'data': UserSerializer(request.user).data
+            'data': serialize_user(request.user)
         }, status=status.HTTP_200_OK)
 
 
@@ -131,25 +177,18 @@ class UserListView(generics.ListAPIView):
     """API endpoint to list all users."""
     
     serializer_class = UserSerializer
+    pagination_class = UserCursorPagination
+    permission_classes = (IsAuthenticated,)
     
     def get_queryset(self):
-        """Return all users except the current user."""
-        if self.request.user.is_authenticated:
-            return User.objects.exclude(id=self.request.user.id).order_by('-date_joined')
-        return User.objects.none()
+        """Return all users except the current user, as value dicts."""
+        return User.objects.exclude(id=self.request.user.id).annotate(
+            full_name=full_name_expression()
+        ).order_by('-date_joined', '-id').values(*USER_COLUMNS, 'full_name')
     
     def list(self, request, *args, **kwargs):
         """Return formatted response."""
-        if not request.user.is_authenticated:
-            return Response({
-                'status': 'error',
-                'message': 'Authentication required'
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        
-        return Response({
-            'status': 'success',
-            'data': serializer.data
-        }, status=status.HTTP_200_OK) 
\ No newline at end of file
+        # Read-only rows go through serpy rather than building model
+        # instances only to serialize them back into dicts
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(UserRowSerializer(page, many=True).data) 
\ No newline at end of file